@@ -5,6 +5,7 @@ FastAPI application for managing programs, compilation, and documentation.
 
 from fastapi import FastAPI, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
 from fastapi.staticfiles import StaticFiles
 import os
 
@@ -31,6 +32,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Compress larger JSON payloads (docs, examples, chat replies)
+app.add_middleware(GZipMiddleware, minimum_size=1024)
+
 # Include routers
 app.include_router(programs.router, prefix="/api/programs", tags=["Programs"])
 app.include_router(compiler.router, prefix="/api/compiler", tags=["Compiler"])
@@ -40,6 +44,19 @@ app.include_router(ai_router.router, prefix="/api/ai", tags=["AI Assistant"])
 app.include_router(firmware_router.router, prefix="/api/firmware", tags=["Firmware"])
 
 
+@app.on_event("startup")
+async def preflight_firmware_tools():
+    firmware_router.start_preflight()
+
+
+@app.on_event("shutdown")
+async def shutdown_shared_resources():
+    await ai_router.close_clients()
+    await firmware_router.stop_preflight()
+    await firmware_router.close_client()
+    compiler.shutdown_executor()
+
+
 @app.get("/")
 async def root():
     return {
@@ -60,8 +77,14 @@ async def websocket_terminal(websocket: WebSocket):
     await connection_manager.connect(websocket)
     try:
         while True:
-            data = await websocket.receive_text()
-            # Broadcast terminal output to all connected clients
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                raise WebSocketDisconnect(message.get("code", 1000))
+            # Broadcast terminal output to all connected clients, keeping the
+            # frame type so binary output is never decoded and re-encoded
+            data = message.get("bytes")
+            if data is None:
+                data = message.get("text", "")
             await connection_manager.broadcast(data)
     except WebSocketDisconnect:
         connection_manager.disconnect(websocket)
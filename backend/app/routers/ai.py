@@ -10,8 +10,11 @@ Set at least one key. The frontend can pick which provider to use.
 """
 
 import os
-import json
+import time
+import hashlib
 import httpx
+import orjson
+from collections import OrderedDict
 from typing import Optional
 from fastapi import APIRouter, HTTPException
 from fastapi.responses import StreamingResponse
@@ -26,6 +29,27 @@ ANTHROPIC_MODEL = "claude-sonnet-4-20250514"
 GEMINI_API_URL = "https://generativelanguage.googleapis.com/v1beta/models"
 GEMINI_MODEL = "gemini-2.5-flash"
 
+# API keys are read once at import; uvicorn's --env-file populates the
+# environment before the app is loaded, and it does not change afterwards.
+_ANTHROPIC_KEY = os.getenv("ANTHROPIC_API_KEY", "")
+_GEMINI_KEY = os.getenv("GEMINI_API_KEY", "")
+
+# Shared HTTP clients, created lazily so every chat turn reuses warm
+# keep-alive connections instead of paying a fresh TCP + TLS handshake.
+# HTTP/2 lets concurrent chats multiplex over a few connections, so the
+# pool can stay small.
+_HTTP_TIMEOUT = httpx.Timeout(120.0)
+_HTTP_LIMITS = httpx.Limits(max_connections=20, max_keepalive_connections=20)
+
+_anthropic_client: Optional[httpx.AsyncClient] = None
+_gemini_client: Optional[httpx.AsyncClient] = None
+
+# Exact-match response cache for /chat. Students frequently send the same
+# question against the same code, so identical turns skip the provider call.
+_CHAT_CACHE_MAX_ENTRIES = 512
+_CHAT_CACHE_TTL_SECONDS = 3600.0
+_chat_cache: "OrderedDict[str, tuple[float, ChatResponse]]" = OrderedDict()
+
 SYSTEM_PROMPT = """You are an expert AI coding assistant integrated into a LEGO Spike Prime programming IDE (similar to code.pybricks.com). Your role is to help users write Python code for controlling LEGO Spike Prime robots using the Pybricks library.
 
 You have deep knowledge of:
@@ -47,6 +71,25 @@ When the user shares their current code, analyze it and suggest improvements.
 Keep responses concise and actionable. Format code with ```python blocks.
 If asked about Blockly/drag-and-drop blocks, explain the equivalent Python code."""
 
+# Invariant request parts, built once. Static headers live on the shared
+# clients; the body templates are pre-serialized JSON objects with the closing
+# brace dropped so per-call fields can be appended (see _json_body).
+_ANTHROPIC_HEADERS = {
+    "anthropic-version": "2023-06-01",
+    "content-type": "application/json",
+}
+_GEMINI_HEADERS = {"content-type": "application/json"}
+
+_ANTHROPIC_BODY_PREFIX = orjson.dumps({
+    "model": ANTHROPIC_MODEL,
+    "max_tokens": 4096,
+    "system": SYSTEM_PROMPT,
+})[:-1]
+_GEMINI_BODY_PREFIX = orjson.dumps({
+    "systemInstruction": {"parts": [{"text": SYSTEM_PROMPT}]},
+    "generationConfig": {"maxOutputTokens": 4096},
+})[:-1]
+
 
 class ChatMessage(BaseModel):
     role: str = Field(..., description="Role: 'user' or 'assistant'")
@@ -71,20 +114,51 @@ class ChatResponse(BaseModel):
 # Helpers
 # ---------------------------------------------------------------------------
 
+def _get_anthropic_client() -> httpx.AsyncClient:
+    global _anthropic_client
+    if _anthropic_client is None or _anthropic_client.is_closed:
+        _anthropic_client = httpx.AsyncClient(
+            http2=True,
+            headers=_ANTHROPIC_HEADERS,
+            timeout=_HTTP_TIMEOUT,
+            limits=_HTTP_LIMITS,
+        )
+    return _anthropic_client
+
+
+def _get_gemini_client() -> httpx.AsyncClient:
+    global _gemini_client
+    if _gemini_client is None or _gemini_client.is_closed:
+        _gemini_client = httpx.AsyncClient(
+            http2=True,
+            headers=_GEMINI_HEADERS,
+            timeout=_HTTP_TIMEOUT,
+            limits=_HTTP_LIMITS,
+        )
+    return _gemini_client
+
+
+async def close_clients() -> None:
+    """Close the shared provider clients. Called on application shutdown."""
+    global _anthropic_client, _gemini_client
+    for client in (_anthropic_client, _gemini_client):
+        if client is not None:
+            await client.aclose()
+    _anthropic_client = None
+    _gemini_client = None
+
+
 def _pick_provider(requested: Optional[str] = None) -> str:
     """Return the provider to use. Priority: requested > gemini (free) > anthropic."""
-    anthropic_key = os.getenv("ANTHROPIC_API_KEY", "")
-    gemini_key = os.getenv("GEMINI_API_KEY", "")
-
-    if requested == "anthropic" and anthropic_key:
+    if requested == "anthropic" and _ANTHROPIC_KEY:
         return "anthropic"
-    if requested == "gemini" and gemini_key:
+    if requested == "gemini" and _GEMINI_KEY:
         return "gemini"
 
     # Auto-pick: prefer gemini (free)
-    if gemini_key:
+    if _GEMINI_KEY:
         return "gemini"
-    if anthropic_key:
+    if _ANTHROPIC_KEY:
         return "anthropic"
 
     raise HTTPException(
@@ -95,7 +169,6 @@ def _pick_provider(requested: Optional[str] = None) -> str:
 
 def _build_messages(request: ChatRequest) -> list[dict]:
     """Build the messages array (role/content dicts)."""
-    messages = []
     code_context = ""
     if request.current_code:
         lang = "python" if request.editor_mode != "blocks" else "blockly"
@@ -104,82 +177,119 @@ def _build_messages(request: ChatRequest) -> list[dict]:
             f"```python\n{request.current_code}\n```\n"
         )
 
-    for i, msg in enumerate(request.messages):
-        content = msg.content
-        if i == len(request.messages) - 1 and msg.role == "user" and code_context:
-            content += code_context
-        messages.append({"role": msg.role, "content": content})
+    messages = [{"role": m.role, "content": m.content} for m in request.messages]
+    if code_context and messages and messages[-1]["role"] == "user":
+        messages[-1]["content"] += code_context
 
     return messages
 
 
+def _cache_key(provider: str, messages: list[dict]) -> str:
+    """Hash the provider and the full message list (which embeds the editor code)."""
+    h = hashlib.blake2b(digest_size=16)
+    h.update(provider.encode())
+    for msg in messages:
+        h.update(b"\0")
+        h.update(msg["role"].encode())
+        h.update(b"\0")
+        h.update(msg["content"].encode())
+    return h.hexdigest()
+
+
+def _cache_get(key: str) -> Optional[ChatResponse]:
+    entry = _chat_cache.get(key)
+    if entry is None:
+        return None
+    expires_at, response = entry
+    if time.monotonic() >= expires_at:
+        del _chat_cache[key]
+        return None
+    _chat_cache.move_to_end(key)
+    return response
+
+
+def _cache_put(key: str, response: ChatResponse) -> None:
+    _chat_cache[key] = (time.monotonic() + _CHAT_CACHE_TTL_SECONDS, response)
+    _chat_cache.move_to_end(key)
+    while len(_chat_cache) > _CHAT_CACHE_MAX_ENTRIES:
+        _chat_cache.popitem(last=False)
+
+
+def _json_body(prefix: bytes, fields: dict) -> bytes:
+    """Append per-request fields to a pre-serialized body template."""
+    return prefix + b"," + orjson.dumps(fields)[1:]
+
+
+async def _aiter_sse_data(resp: httpx.Response):
+    """Yield the raw ``data:`` payloads of an upstream SSE stream as bytes.
+
+    Splitting lines on the byte stream avoids decoding the body to str only
+    for orjson to work on bytes again.
+    """
+    buf = bytearray()
+    async for chunk in resp.aiter_bytes():
+        buf += chunk
+        while (i := buf.find(b"\n")) != -1:
+            line = bytes(buf[:i]).rstrip(b"\r")
+            del buf[:i + 1]
+            if line.startswith(b"data: "):
+                yield line[6:]
+    if buf.startswith(b"data: "):
+        yield bytes(buf[6:]).rstrip(b"\r")
+
+
+def _sse(obj: dict) -> bytes:
+    """Encode one Server-Sent Events frame."""
+    return b"data: " + orjson.dumps(obj) + b"\n\n"
+
+
 # ---------------------------------------------------------------------------
 # Anthropic helpers
 # ---------------------------------------------------------------------------
 
 async def _anthropic_chat(messages: list[dict], api_key: str) -> ChatResponse:
-    async with httpx.AsyncClient(timeout=60.0) as client:
-        resp = await client.post(
-            ANTHROPIC_API_URL,
-            headers={
-                "x-api-key": api_key,
-                "anthropic-version": "2023-06-01",
-                "content-type": "application/json",
-            },
-            json={
-                "model": ANTHROPIC_MODEL,
-                "max_tokens": 4096,
-                "system": SYSTEM_PROMPT,
-                "messages": messages,
-            },
-        )
-        if resp.status_code != 200:
-            raise HTTPException(status_code=resp.status_code, detail=resp.text)
-        data = resp.json()
-        reply = "".join(b["text"] for b in data.get("content", []) if b.get("type") == "text")
-        return ChatResponse(reply=reply, usage=data.get("usage"), provider="anthropic")
+    client = _get_anthropic_client()
+    resp = await client.post(
+        ANTHROPIC_API_URL,
+        headers={"x-api-key": api_key},
+        content=_json_body(_ANTHROPIC_BODY_PREFIX, {"messages": messages}),
+        timeout=60.0,
+    )
+    if resp.status_code != 200:
+        raise HTTPException(status_code=resp.status_code, detail=resp.text)
+    data = resp.json()
+    reply = "".join(b["text"] for b in data.get("content", []) if b.get("type") == "text")
+    return ChatResponse(reply=reply, usage=data.get("usage"), provider="anthropic")
 
 
 async def _anthropic_stream(messages: list[dict], api_key: str):
-    async with httpx.AsyncClient(timeout=120.0) as client:
-        async with client.stream(
-            "POST",
-            ANTHROPIC_API_URL,
-            headers={
-                "x-api-key": api_key,
-                "anthropic-version": "2023-06-01",
-                "content-type": "application/json",
-            },
-            json={
-                "model": ANTHROPIC_MODEL,
-                "max_tokens": 4096,
-                "system": SYSTEM_PROMPT,
-                "messages": messages,
-                "stream": True,
-            },
-        ) as resp:
-            if resp.status_code != 200:
-                error = await resp.aread()
-                yield f"data: {json.dumps({'type': 'error', 'error': error.decode()})}\n\n"
-                return
-
-            async for line in resp.aiter_lines():
-                if line.startswith("data: "):
-                    data_str = line[6:]
-                    if data_str.strip() == "[DONE]":
-                        yield f"data: {json.dumps({'type': 'done'})}\n\n"
-                        break
-                    try:
-                        event = json.loads(data_str)
-                        et = event.get("type", "")
-                        if et == "content_block_delta":
-                            delta = event.get("delta", {})
-                            if delta.get("type") == "text_delta":
-                                yield f"data: {json.dumps({'type': 'text', 'text': delta['text']})}\n\n"
-                        elif et == "message_stop":
-                            yield f"data: {json.dumps({'type': 'done'})}\n\n"
-                    except json.JSONDecodeError:
-                        pass
+    client = _get_anthropic_client()
+    async with client.stream(
+        "POST",
+        ANTHROPIC_API_URL,
+        headers={"x-api-key": api_key},
+        content=_json_body(_ANTHROPIC_BODY_PREFIX, {"messages": messages, "stream": True}),
+    ) as resp:
+        if resp.status_code != 200:
+            error = await resp.aread()
+            yield _sse({'type': 'error', 'error': error.decode()})
+            return
+
+        async for payload in _aiter_sse_data(resp):
+            if payload.strip() == b"[DONE]":
+                yield _sse({"type": "done"})
+                break
+            try:
+                event = orjson.loads(payload)
+                et = event.get("type", "")
+                if et == "content_block_delta":
+                    delta = event.get("delta", {})
+                    if delta.get("type") == "text_delta":
+                        yield _sse({"type": "text", "text": delta["text"]})
+                elif et == "message_stop":
+                    yield _sse({"type": "done"})
+            except orjson.JSONDecodeError:
+                pass
 
 
 # ---------------------------------------------------------------------------
@@ -197,70 +307,61 @@ def _gemini_build_contents(messages: list[dict]) -> list[dict]:
 
 async def _gemini_chat(messages: list[dict], api_key: str) -> ChatResponse:
     url = f"{GEMINI_API_URL}/{GEMINI_MODEL}:generateContent"
-    contents = _gemini_build_contents(messages)
-
-    body = {
-        "contents": contents,
-        "systemInstruction": {"parts": [{"text": SYSTEM_PROMPT}]},
-        "generationConfig": {"maxOutputTokens": 4096},
-    }
-
-    async with httpx.AsyncClient(timeout=60.0) as client:
-        resp = await client.post(
-            url,
-            headers={"x-goog-api-key": api_key},
-            json=body,
-        )
-        if resp.status_code != 200:
-            raise HTTPException(status_code=resp.status_code, detail=resp.text)
-        data = resp.json()
-
-        # Extract text from response
-        reply = ""
-        for candidate in data.get("candidates", []):
-            for part in candidate.get("content", {}).get("parts", []):
-                reply += part.get("text", "")
+    body = _json_body(_GEMINI_BODY_PREFIX, {"contents": _gemini_build_contents(messages)})
+
+    client = _get_gemini_client()
+    resp = await client.post(
+        url,
+        headers={"x-goog-api-key": api_key},
+        content=body,
+        timeout=60.0,
+    )
+    if resp.status_code != 200:
+        raise HTTPException(status_code=resp.status_code, detail=resp.text)
+    data = resp.json()
+
+    # Extract text from response
+    reply = "".join(
+        part.get("text", "")
+        for candidate in data.get("candidates", ())
+        for part in candidate.get("content", {}).get("parts", ())
+    )
 
-        usage = data.get("usageMetadata")
-        return ChatResponse(reply=reply, usage=usage, provider="gemini")
+    usage = data.get("usageMetadata")
+    return ChatResponse(reply=reply, usage=usage, provider="gemini")
 
 
 async def _gemini_stream(messages: list[dict], api_key: str):
     url = f"{GEMINI_API_URL}/{GEMINI_MODEL}:streamGenerateContent?alt=sse"
-    contents = _gemini_build_contents(messages)
-
-    body = {
-        "contents": contents,
-        "systemInstruction": {"parts": [{"text": SYSTEM_PROMPT}]},
-        "generationConfig": {"maxOutputTokens": 4096},
-    }
-
-    async with httpx.AsyncClient(timeout=120.0) as client:
-        async with client.stream(
-            "POST",
-            url,
-            headers={"x-goog-api-key": api_key},
-            json=body,
-        ) as resp:
-            if resp.status_code != 200:
-                error = await resp.aread()
-                yield f"data: {json.dumps({'type': 'error', 'error': error.decode()})}\n\n"
-                return
-
-            async for line in resp.aiter_lines():
-                if line.startswith("data: "):
-                    data_str = line[6:]
-                    try:
-                        chunk = json.loads(data_str)
-                        for candidate in chunk.get("candidates", []):
-                            for part in candidate.get("content", {}).get("parts", []):
-                                text = part.get("text", "")
-                                if text:
-                                    yield f"data: {json.dumps({'type': 'text', 'text': text})}\n\n"
-                    except json.JSONDecodeError:
-                        pass
-
-    yield f"data: {json.dumps({'type': 'done'})}\n\n"
+    body = _json_body(_GEMINI_BODY_PREFIX, {"contents": _gemini_build_contents(messages)})
+
+    client = _get_gemini_client()
+    async with client.stream(
+        "POST",
+        url,
+        headers={"x-goog-api-key": api_key},
+        content=body,
+    ) as resp:
+        if resp.status_code != 200:
+            error = await resp.aread()
+            yield _sse({'type': 'error', 'error': error.decode()})
+            return
+
+        async for payload in _aiter_sse_data(resp):
+            try:
+                chunk = orjson.loads(payload)
+            except orjson.JSONDecodeError:
+                continue
+            # One outgoing frame per upstream chunk, however many parts it has
+            text = "".join(
+                part.get("text", "")
+                for candidate in chunk.get("candidates", ())
+                for part in candidate.get("content", {}).get("parts", ())
+            )
+            if text:
+                yield _sse({"type": "text", "text": text})
+
+    yield _sse({"type": "done"})
 
 
 # ---------------------------------------------------------------------------
@@ -273,11 +374,17 @@ async def chat(request: ChatRequest):
     provider = _pick_provider(request.provider)
     messages = _build_messages(request)
 
+    key = None if request.stream else _cache_key(provider, messages)
+    if key is not None:
+        cached = _cache_get(key)
+        if cached is not None:
+            return cached
+
     try:
         if provider == "gemini":
-            return await _gemini_chat(messages, os.getenv("GEMINI_API_KEY", ""))
+            response = await _gemini_chat(messages, _GEMINI_KEY)
         else:
-            return await _anthropic_chat(messages, os.getenv("ANTHROPIC_API_KEY", ""))
+            response = await _anthropic_chat(messages, _ANTHROPIC_KEY)
     except HTTPException:
         raise
     except httpx.TimeoutException:
@@ -285,6 +392,10 @@ async def chat(request: ChatRequest):
     except httpx.RequestError as e:
         raise HTTPException(status_code=502, detail=f"Connection error: {str(e)}")
 
+    if key is not None:
+        _cache_put(key, response)
+    return response
+
 
 @router.post("/chat/stream")
 async def chat_stream(request: ChatRequest):
@@ -295,22 +406,28 @@ async def chat_stream(request: ChatRequest):
     async def generate():
         try:
             if provider == "gemini":
-                async for chunk in _gemini_stream(messages, os.getenv("GEMINI_API_KEY", "")):
+                async for chunk in _gemini_stream(messages, _GEMINI_KEY):
                     yield chunk
             else:
-                async for chunk in _anthropic_stream(messages, os.getenv("ANTHROPIC_API_KEY", "")):
+                async for chunk in _anthropic_stream(messages, _ANTHROPIC_KEY):
                     yield chunk
         except Exception as e:
-            yield f"data: {json.dumps({'type': 'error', 'error': str(e)})}\n\n"
-
-    return StreamingResponse(generate(), media_type="text/event-stream")
+            yield _sse({'type': 'error', 'error': str(e)})
+
+    # Opt out of GZipMiddleware: compressed SSE is buffered by some proxies
+    # and by the middleware itself, which would hold back tokens.
+    return StreamingResponse(
+        generate(),
+        media_type="text/event-stream",
+        headers={"Content-Encoding": "identity"},
+    )
 
 
 @router.get("/status")
 async def ai_status():
     """Check which AI providers are configured."""
-    anthropic_key = bool(os.getenv("ANTHROPIC_API_KEY", ""))
-    gemini_key = bool(os.getenv("GEMINI_API_KEY", ""))
+    anthropic_key = bool(_ANTHROPIC_KEY)
+    gemini_key = bool(_GEMINI_KEY)
 
     # Active provider follows the same logic as _pick_provider
     active = "gemini" if gemini_key else ("anthropic" if anthropic_key else None)
@@ -5,12 +5,183 @@ Compiles Python source to .mpy bytecode format for Pybricks hubs.
 from fastapi import APIRouter, HTTPException
 from fastapi.responses import Response
 from pydantic import BaseModel
-import subprocess
-import tempfile
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Optional
+import asyncio
+import hashlib
+import multiprocessing
 import os
+import re
 
 router = APIRouter()
 
+MPY_CROSS_TIMEOUT = 30
+SYNTAX_CHECK_TIMEOUT = 10
+
+# mpy-cross reports errors as a traceback ending in e.g.
+#   File "main.py", line 2
+#   SyntaxError: invalid syntax
+_MPY_LINE_RE = re.compile(r"line (\d+)")
+_MPY_SYNTAX_ERROR_RE = re.compile(r"^((?:Syntax|Indentation)Error): (.*)$", re.MULTILINE)
+
+
+def _resolve_mpy_cross() -> str:
+    """Return the native mpy-cross binary shipped with the mpy_cross package.
+
+    The ``mpy-cross`` console script on PATH is a Python wrapper, so calling
+    it costs a full interpreter start-up before the compiler even runs.
+    Falls back to PATH lookup when the package is not importable.
+    """
+    try:
+        import mpy_cross
+    except (ImportError, SystemExit):
+        return "mpy-cross"
+    mpy_cross.fix_perms()
+    return mpy_cross.mpy_cross
+
+
+MPY_CROSS_BIN = _resolve_mpy_cross()
+
+# Bound concurrent compiler processes to the CPU count so a burst of
+# requests queues up instead of fork-storming the host.
+_mpy_cross_slots = asyncio.Semaphore(os.cpu_count() or 4)
+
+# CPU-bound syntax checks run in worker processes so a large source file
+# does not freeze the event loop (and every SSE/WebSocket stream with it).
+_syntax_executor: Optional[ProcessPoolExecutor] = None
+
+
+def _get_syntax_executor() -> ProcessPoolExecutor:
+    global _syntax_executor
+    if _syntax_executor is None:
+        # Never fork the threaded server process: a worker forked while
+        # another thread holds a lock can deadlock on its first task.
+        methods = multiprocessing.get_all_start_methods()
+        context = multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+        _syntax_executor = ProcessPoolExecutor(max_workers=os.cpu_count(), mp_context=context)
+    return _syntax_executor
+
+
+def shutdown_executor() -> None:
+    """Stop the syntax-check worker processes. Called on application shutdown."""
+    global _syntax_executor
+    if _syntax_executor is not None:
+        _syntax_executor.shutdown(wait=False, cancel_futures=True)
+        _syntax_executor = None
+
+
+def _check_source(source_code: str, filename: str) -> None:
+    # Code objects cannot be pickled back from the worker, so discard it.
+    compile(source_code, filename, "exec")
+
+
+def _discard_syntax_executor(executor: ProcessPoolExecutor) -> None:
+    global _syntax_executor
+    if _syntax_executor is executor:
+        executor.shutdown(wait=False, cancel_futures=True)
+        _syntax_executor = None
+
+
+async def _check_syntax(source_code: str, filename: str) -> None:
+    """Run compile() off the event loop. Raises SyntaxError on invalid code."""
+    loop = asyncio.get_running_loop()
+    for attempt in range(2):
+        executor = _get_syntax_executor()
+        try:
+            await asyncio.wait_for(
+                loop.run_in_executor(executor, _check_source, source_code, filename),
+                timeout=SYNTAX_CHECK_TIMEOUT,
+            )
+            return
+        except BrokenProcessPool:
+            # A worker died (OOM killer, external kill); retry once on a fresh pool
+            _discard_syntax_executor(executor)
+            if attempt:
+                raise
+        except asyncio.TimeoutError:
+            # A stuck worker would keep its slot forever; start over next time
+            _discard_syntax_executor(executor)
+            raise HTTPException(status_code=408, detail="Syntax check timed out")
+
+
+# Content-addressed LRU of compiled bytecode. Students often recompile or
+# re-download unchanged source, which then skips mpy-cross entirely.
+_MPY_CACHE_MAX_ENTRIES = 256
+_MPY_CACHE_MAX_BYTES = 4 * 1024 * 1024
+_mpy_cache: "OrderedDict[str, bytes]" = OrderedDict()
+_mpy_cache_bytes = 0
+
+
+def _mpy_cache_key(source_code: str, filename: str) -> str:
+    # The filename is embedded in the .mpy, so it is part of the key.
+    h = hashlib.blake2b(digest_size=16)
+    h.update(filename.encode("utf-8"))
+    h.update(b"\0")
+    h.update(source_code.encode("utf-8"))
+    return h.hexdigest()
+
+
+def _mpy_cache_put(key: str, content: bytes) -> None:
+    global _mpy_cache_bytes
+    if key in _mpy_cache:
+        _mpy_cache_bytes -= len(_mpy_cache.pop(key))
+    _mpy_cache[key] = content
+    _mpy_cache_bytes += len(content)
+    while _mpy_cache and (
+        len(_mpy_cache) > _MPY_CACHE_MAX_ENTRIES or _mpy_cache_bytes > _MPY_CACHE_MAX_BYTES
+    ):
+        _, evicted = _mpy_cache.popitem(last=False)
+        _mpy_cache_bytes -= len(evicted)
+
+
+async def _run_mpy_cross(source_code: str, filename: str) -> bytes:
+    """Compile source with mpy-cross, piping source in and bytecode out.
+
+    Results are cached by source hash. Raises FileNotFoundError if
+    mpy-cross is not installed.
+    """
+    key = _mpy_cache_key(source_code, filename)
+    cached = _mpy_cache.get(key)
+    if cached is not None:
+        _mpy_cache.move_to_end(key)
+        return cached
+
+    async with _mpy_cross_slots:
+        proc = await asyncio.create_subprocess_exec(
+            MPY_CROSS_BIN, "-s", filename, "-o", "/dev/stdout", "-",
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+        )
+        try:
+            out, err = await asyncio.wait_for(
+                proc.communicate(source_code.encode("utf-8")),
+                timeout=MPY_CROSS_TIMEOUT,
+            )
+        except asyncio.TimeoutError:
+            proc.kill()
+            await proc.wait()
+            raise HTTPException(status_code=408, detail="Compilation timed out")
+
+    if proc.returncode != 0:
+        stderr = err.decode("utf-8", errors="replace")
+        syntax_error = _MPY_SYNTAX_ERROR_RE.search(stderr)
+        if syntax_error:
+            line = _MPY_LINE_RE.search(stderr)
+            raise HTTPException(
+                status_code=400,
+                detail=f"Syntax error at line {line.group(1) if line else '?'}: {syntax_error.group(2)}",
+            )
+        raise HTTPException(
+            status_code=400,
+            detail=f"Compilation failed: {stderr}",
+        )
+
+    _mpy_cache_put(key, out)
+    return out
+
 
 class CompileRequest(BaseModel):
     source_code: str
@@ -38,7 +209,7 @@ class SyntaxCheckResponse(BaseModel):
 async def check_syntax(request: SyntaxCheckRequest):
     """Check Python syntax without compiling."""
     try:
-        compile(request.source_code, "<string>", "exec")
+        await _check_syntax(request.source_code, "<string>")
         return SyntaxCheckResponse(valid=True)
     except SyntaxError as e:
         return SyntaxCheckResponse(
@@ -56,103 +227,46 @@ async def compile_program(request: CompileRequest):
     Uses mpy-cross to cross-compile for Pybricks firmware.
     The compiled .mpy file can be uploaded to the hub.
     """
-    # First check syntax
-    try:
-        compile(request.source_code, request.filename, "exec")
-    except SyntaxError as e:
-        raise HTTPException(
-            status_code=400,
-            detail=f"Syntax error at line {e.lineno}: {e.msg}",
-        )
-
-    # Try to compile with mpy-cross
+    # mpy-cross reports syntax errors itself, so no separate pre-check
     try:
-        with tempfile.TemporaryDirectory() as tmpdir:
-            source_path = os.path.join(tmpdir, request.filename)
-            output_path = os.path.join(
-                tmpdir, request.filename.replace(".py", ".mpy")
-            )
-
-            # Write source file
-            with open(source_path, "w") as f:
-                f.write(request.source_code)
-
-            # Run mpy-cross
-            result = subprocess.run(
-                ["mpy-cross", "-o", output_path, source_path],
-                capture_output=True,
-                text=True,
-                timeout=30,
-            )
-
-            if result.returncode != 0:
-                raise HTTPException(
-                    status_code=400,
-                    detail=f"Compilation failed: {result.stderr}",
-                )
-
-            if os.path.exists(output_path):
-                size = os.path.getsize(output_path)
-                return CompileResponse(
-                    success=True,
-                    message=f"Compiled successfully ({size} bytes)",
-                    size=size,
-                )
-            else:
-                return CompileResponse(
-                    success=True,
-                    message="Compiled successfully (size unknown)",
-                )
-
+        content = await _run_mpy_cross(request.source_code, request.filename)
     except FileNotFoundError:
         # mpy-cross not installed - fall back to syntax check only
+        try:
+            await _check_syntax(request.source_code, request.filename)
+        except SyntaxError as e:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Syntax error at line {e.lineno}: {e.msg}",
+            )
         return CompileResponse(
             success=True,
             message="Syntax valid (mpy-cross not available for bytecode compilation)",
         )
-    except subprocess.TimeoutExpired:
-        raise HTTPException(status_code=408, detail="Compilation timed out")
+
+    size = len(content)
+    return CompileResponse(
+        success=True,
+        message=f"Compiled successfully ({size} bytes)",
+        size=size,
+    )
 
 
 @router.post("/compile/download")
 async def compile_and_download(request: CompileRequest):
     """Compile Python source and return the .mpy binary file."""
     try:
-        with tempfile.TemporaryDirectory() as tmpdir:
-            source_path = os.path.join(tmpdir, request.filename)
-            output_path = os.path.join(
-                tmpdir, request.filename.replace(".py", ".mpy")
-            )
-
-            with open(source_path, "w") as f:
-                f.write(request.source_code)
-
-            result = subprocess.run(
-                ["mpy-cross", "-o", output_path, source_path],
-                capture_output=True,
-                text=True,
-                timeout=30,
-            )
-
-            if result.returncode != 0:
-                raise HTTPException(
-                    status_code=400,
-                    detail=f"Compilation failed: {result.stderr}",
-                )
-
-            with open(output_path, "rb") as f:
-                content = f.read()
-
-            return Response(
-                content=content,
-                media_type="application/octet-stream",
-                headers={
-                    "Content-Disposition": f'attachment; filename="{request.filename.replace(".py", ".mpy")}"'
-                },
-            )
-
+        content = await _run_mpy_cross(request.source_code, request.filename)
     except FileNotFoundError:
         raise HTTPException(
             status_code=501,
             detail="mpy-cross is not installed. Install with: pip install mpy-cross",
         )
+
+    return Response(
+        content=content,
+        media_type="application/octet-stream",
+        headers={
+            "Content-Disposition": f'attachment; filename="{request.filename.replace(".py", ".mpy")}"'
+        },
+    )
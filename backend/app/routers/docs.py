@@ -1,27 +1,34 @@
 """Pybricks API documentation reference for Spike Prime."""
 
-from fastapi import APIRouter
-from pydantic import BaseModel
+from dataclasses import dataclass, field
+from fastapi import APIRouter, Request
 from typing import List, Optional
+import orjson
+
+from ..static_json import StaticJSON, not_found
 
 router = APIRouter()
 
 
-class ApiMethod(BaseModel):
+# Plain read-only containers: the data is trusted literals built once at
+# import, so there is nothing for Pydantic to validate.
+@dataclass(slots=True, frozen=True)
+class ApiMethod:
     name: str
     signature: str
     description: str
-    parameters: List[dict] = []
+    parameters: List[dict] = field(default_factory=list)
     returns: str = ""
     example: str = ""
 
 
-class ApiClass(BaseModel):
+@dataclass(slots=True, frozen=True)
+class ApiClass:
     name: str
     module: str
     description: str
     constructor: str = ""
-    methods: List[ApiMethod] = []
+    methods: List[ApiMethod] = field(default_factory=list)
 
 
 # Pybricks API documentation for Spike Prime
@@ -273,45 +280,57 @@ SPIKE_PRIME_API: List[ApiClass] = [
 ]
 
 
-@router.get("/api-reference", response_model=List[ApiClass])
-async def get_api_reference():
+# Pybricks modules available on Spike Prime
+PYBRICKS_MODULES: dict = {
+    "pybricks.hubs": {
+        "description": "Hub classes",
+        "classes": ["PrimeHub"],
+    },
+    "pybricks.pupdevices": {
+        "description": "Powered Up device classes",
+        "classes": ["Motor", "ColorSensor", "UltrasonicSensor", "ForceSensor"],
+    },
+    "pybricks.parameters": {
+        "description": "Parameter constants",
+        "enums": ["Port", "Direction", "Stop", "Color", "Button", "Side"],
+    },
+    "pybricks.robotics": {
+        "description": "Robotics classes",
+        "classes": ["DriveBase"],
+    },
+    "pybricks.tools": {
+        "description": "Utility tools",
+        "classes": ["StopWatch"],
+        "functions": ["wait"],
+    },
+}
+
+
+# The reference data never changes at runtime, so serialize it once instead
+# of running it through FastAPI's encoder on every request. Routes declare
+# their models via `responses=` so the OpenAPI schema is kept without
+# response_model validation.
+_API_REFERENCE = StaticJSON(SPIKE_PRIME_API)
+_MODULES = StaticJSON(PYBRICKS_MODULES)
+_CLASSES_BY_NAME = {c.name.lower(): StaticJSON(c) for c in SPIKE_PRIME_API}
+
+
+@router.get("/api-reference", responses={200: {"model": List[ApiClass]}})
+async def get_api_reference(request: Request):
     """Get complete Pybricks API reference for Spike Prime."""
-    return SPIKE_PRIME_API
+    return _API_REFERENCE.response(request)
 
 
-@router.get("/api-reference/{class_name}", response_model=ApiClass)
-async def get_class_reference(class_name: str):
+@router.get("/api-reference/{class_name}", responses={200: {"model": ApiClass}})
+async def get_class_reference(class_name: str, request: Request):
     """Get API reference for a specific class."""
-    for api_class in SPIKE_PRIME_API:
-        if api_class.name.lower() == class_name.lower():
-            return api_class
-    from fastapi import HTTPException
-    raise HTTPException(status_code=404, detail=f"Class '{class_name}' not found")
+    payload = _CLASSES_BY_NAME.get(class_name.lower())
+    if payload is not None:
+        return payload.response(request)
+    return not_found(orjson.dumps({"detail": f"Class '{class_name}' not found"}))
 
 
 @router.get("/modules")
-async def list_modules():
+async def list_modules(request: Request):
     """List all available Pybricks modules for Spike Prime."""
-    return {
-        "pybricks.hubs": {
-            "description": "Hub classes",
-            "classes": ["PrimeHub"],
-        },
-        "pybricks.pupdevices": {
-            "description": "Powered Up device classes",
-            "classes": ["Motor", "ColorSensor", "UltrasonicSensor", "ForceSensor"],
-        },
-        "pybricks.parameters": {
-            "description": "Parameter constants",
-            "enums": ["Port", "Direction", "Stop", "Color", "Button", "Side"],
-        },
-        "pybricks.robotics": {
-            "description": "Robotics classes",
-            "classes": ["DriveBase"],
-        },
-        "pybricks.tools": {
-            "description": "Utility tools",
-            "classes": ["StopWatch"],
-            "functions": ["wait"],
-        },
-    }
+    return _MODULES.response(request)
@@ -1,13 +1,17 @@
 """Example programs for LEGO Spike Prime with Pybricks."""
 
-from fastapi import APIRouter
-from pydantic import BaseModel
+from collections import defaultdict
+from dataclasses import dataclass
+from fastapi import APIRouter, Request
 from typing import List
 
+from ..static_json import StaticJSON, not_found
+
 router = APIRouter()
 
 
-class Example(BaseModel):
+@dataclass(slots=True, frozen=True)
+class Example:
     id: str
     name: str
     description: str
@@ -437,30 +441,47 @@ print("Done!")
 ]
 
 
-@router.get("/", response_model=List[Example])
-async def list_examples():
+# Pre-serialized at import, same as the docs payloads; a request only picks
+# an encoding. Unknown ids and categories share the cached empty/404 bodies.
+_EXAMPLES = StaticJSON(EXAMPLES)
+_CATEGORIES = StaticJSON(sorted({e.category for e in EXAMPLES}))
+_EXAMPLES_BY_ID = {e.id: StaticJSON(e) for e in EXAMPLES}
+_NO_EXAMPLES = StaticJSON([])
+_EXAMPLE_NOT_FOUND = b'{"detail":"Example not found"}'
+
+
+def _group_by_category() -> dict[str, StaticJSON]:
+    groups: dict[str, list] = defaultdict(list)
+    for e in EXAMPLES:
+        groups[e.category.lower()].append(e)
+    return {category: StaticJSON(items) for category, items in groups.items()}
+
+
+_EXAMPLES_BY_CATEGORY = _group_by_category()
+
+
+@router.get("/", responses={200: {"model": List[Example]}})
+async def list_examples(request: Request):
     """List all available example programs."""
-    return EXAMPLES
+    return _EXAMPLES.response(request)
 
 
-@router.get("/categories")
-async def list_categories():
+@router.get("/categories", responses={200: {"model": List[str]}})
+async def list_categories(request: Request):
     """List all example categories."""
-    categories = sorted(set(e.category for e in EXAMPLES))
-    return categories
+    return _CATEGORIES.response(request)
 
 
-@router.get("/category/{category}", response_model=List[Example])
-async def get_examples_by_category(category: str):
+@router.get("/category/{category}", responses={200: {"model": List[Example]}})
+async def get_examples_by_category(category: str, request: Request):
     """Get examples by category."""
-    return [e for e in EXAMPLES if e.category.lower() == category.lower()]
+    return _EXAMPLES_BY_CATEGORY.get(category.lower(), _NO_EXAMPLES).response(request)
 
 
-@router.get("/{example_id}", response_model=Example)
-async def get_example(example_id: str):
+@router.get("/{example_id}", responses={200: {"model": Example}})
+async def get_example(example_id: str, request: Request):
     """Get a specific example by ID."""
-    for example in EXAMPLES:
-        if example.id == example_id:
-            return example
-    from fastapi import HTTPException
-    raise HTTPException(status_code=404, detail="Example not found")
+    payload = _EXAMPLES_BY_ID.get(example_id)
+    if payload is not None:
+        return payload.response(request)
+    return not_found(_EXAMPLE_NOT_FOUND)
@@ -1,16 +1,22 @@
 """Firmware management API for LEGO hubs."""
 
 from fastapi import APIRouter, File, HTTPException, UploadFile
+from starlette.concurrency import run_in_threadpool
 from pydantic import BaseModel
-import json
+from typing import Optional
+import asyncio
+import httpx
+import logging
+import orjson
 import os
 import re
-import subprocess
+import stat
 import sys
 import tempfile
-import urllib.request
+import time
 
 router = APIRouter()
+logger = logging.getLogger(__name__)
 
 
 BACKEND_ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
@@ -19,6 +25,114 @@ BUNDLED_LEGO_RESTORE_BIN_PATH = os.path.join(
     "firmware",
     "prime-v1.3.00.0000-e8c274a.15bc498f956dc12eda9f.bin",
 )
+# The bundled BIN ships with the deploy, so it is checked once at import
+_BUNDLED_BIN_OK = os.path.isfile(BUNDLED_LEGO_RESTORE_BIN_PATH)
+_BUNDLED_BIN_BASENAME = os.path.basename(BUNDLED_LEGO_RESTORE_BIN_PATH)
+
+_PRIMEHUB_ASSET_RE = re.compile(r"^pybricks-primehub-v\d+\.\d+\.\d+\.zip$", re.IGNORECASE)
+
+PYBRICKSDEV_TIMEOUT = 300
+PREFLIGHT_TIMEOUT = 30
+
+_FLASH_ARGV_PREFIX = (sys.executable, "-m", "pybricksdev", "flash")
+_RESTORE_ARGV_PREFIX = (sys.executable, "-m", "pybricksdev", "dfu", "restore")
+_PREFLIGHT_ARGV = (sys.executable, "-c", "import pybricksdev.cli.flash, pybricksdev.dfu")
+
+# pybricksdev flash/restore always use the first DFU device it finds and has
+# no option to pick one, so concurrent runs would contend for the same hub.
+_hub_lock = asyncio.Lock()
+
+_DFU_PREREQUISITES_DETAIL = (
+    "Restore prerequisites are missing (dfu-util/libusb).\n"
+    "Install tools on Linux: sudo apt update && sudo apt install -y dfu-util libusb-1.0-0\n"
+    "Put SPIKE Prime in DFU mode: unplug USB, power OFF, hold Bluetooth button, plug USB, keep holding until LED flashes red/green/blue.\n"
+    "If permission is denied, run: pybricksdev udev | sudo tee /etc/udev/rules.d/99-pybricksdev.rules && "
+    "sudo udevadm control --reload-rules && sudo udevadm trigger"
+)
+
+# (substring of pybricksdev output, status code, detail), checked in order
+_RESTORE_ERRORS = (
+    (
+        "No LEGO DFU USB device found",
+        400,
+        "No LEGO DFU USB device found.\n"
+        "Put SPIKE Prime in DFU mode exactly as follows: unplug USB, power hub OFF, hold the Bluetooth button, plug USB while still holding, keep holding until LED flashes red/green/blue.\n"
+        "Then click Restore FW again.\n"
+        "If still not detected, replug USB and verify device appears with: lsusb | grep 0694",
+    ),
+    ("No working DFU found.", 501, _DFU_PREREQUISITES_DETAIL),
+    ("dfu-util", 501, _DFU_PREREQUISITES_DETAIL),
+    (
+        "No DFU",
+        400,
+        "No DFU device found. Put SPIKE Prime in DFU mode, connect via USB, then try again.",
+    ),
+    (
+        "Permission to access USB device denied",
+        403,
+        "USB permission denied. Run: pybricksdev udev | sudo tee /etc/udev/rules.d/99-pybricksdev.rules "
+        "then reload udev rules and reconnect the hub.",
+    ),
+)
+# One compiled alternation scans the output once; the first row of
+# _RESTORE_ERRORS that matched anywhere still wins, as with per-row checks.
+_RESTORE_ERROR_RE = re.compile("|".join(re.escape(needle) for needle, _, _ in _RESTORE_ERRORS))
+_RESTORE_ERROR_BY_NEEDLE = {
+    needle: (rank, status_code, detail)
+    for rank, (needle, status_code, detail) in enumerate(_RESTORE_ERRORS)
+}
+
+# Uploads are copied from Starlette's spooled file in chunks rather than
+# read into one bytes object
+UPLOAD_COPY_CHUNK_SIZE = 1024 * 1024
+MAX_FIRMWARE_ZIP_BYTES = 8 * 1024 * 1024
+MAX_BACKUP_BIN_BYTES = 2 * 1024 * 1024
+
+# Downloaded release archives, keyed by asset name (which includes the
+# version). Kept next to the bundled BIN rather than in the shared temp dir,
+# where another local user could plant an archive to be flashed.
+_FW_CACHE_DIR = os.path.join(BACKEND_ROOT_DIR, "firmware", "cache")
+FW_CACHE_MAX_VERSIONS = 3
+
+GITHUB_LATEST_RELEASE_URL = "https://api.github.com/repos/pybricks/pybricks-micropython/releases/latest"
+
+# Cached latest-release lookup:
+#   url -> (expires_at, etag, (asset_name, asset_url, asset_size)).
+# Unauthenticated GitHub API calls are limited to 60/hour, and a 304 reply to
+# a conditional request does not count against that limit.
+_CACHE_TTL = 600
+
+# Optional token, sent only to the GitHub API, to lift the lookup limit from
+# 60 to 5000 requests/hour. Read once at import like the AI provider keys.
+_GITHUB_TOKEN = os.getenv("GITHUB_TOKEN") or os.getenv("GH_TOKEN")
+_RATE_LIMIT_WARNING_THRESHOLD = 10
+_release_cache: dict[str, tuple[float, str, tuple[str, str, int]]] = {}
+
+# Shared client so the release lookup and the asset download (github.com ->
+# objects.githubusercontent.com redirect) reuse keep-alive connections.
+_USER_AGENT = "code-lego-spike-portal"
+_http_client: Optional[httpx.AsyncClient] = None
+
+
+def _get_http_client() -> httpx.AsyncClient:
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        _http_client = httpx.AsyncClient(
+            headers={"User-Agent": _USER_AGENT},
+            follow_redirects=True,
+            timeout=httpx.Timeout(60.0, connect=5.0),
+            limits=httpx.Limits(max_connections=4, max_keepalive_connections=4),
+            transport=httpx.AsyncHTTPTransport(retries=3),
+        )
+    return _http_client
+
+
+async def close_client() -> None:
+    """Close the shared GitHub client. Called on application shutdown."""
+    global _http_client
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
 
 
 class FirmwareInstallResponse(BaseModel):
@@ -34,74 +148,129 @@ class LegoRestoreInfoResponse(BaseModel):
     note: str = ""
 
 
-def _restore_firmware_bin(bin_path: str, source_label: str) -> FirmwareInstallResponse:
-    result = subprocess.run(
-        [sys.executable, "-m", "pybricksdev", "dfu", "restore", bin_path],
-        capture_output=True,
-        text=True,
-        timeout=300,
-    )
+def _safe_unlink(path: str) -> None:
+    try:
+        os.unlink(path)
+    except FileNotFoundError:
+        pass
 
-    output = (result.stdout or "") + ("\n" + result.stderr if result.stderr else "")
-    if result.returncode != 0:
-        if "No LEGO DFU USB device found" in output or "RuntimeError: No LEGO DFU USB device found" in output:
-            raise HTTPException(
-                status_code=400,
-                detail=(
-                    "No LEGO DFU USB device found.\n"
-                    "Put SPIKE Prime in DFU mode exactly as follows: unplug USB, power hub OFF, hold the Bluetooth button, plug USB while still holding, keep holding until LED flashes red/green/blue.\n"
-                    "Then click Restore FW again.\n"
-                    "If still not detected, replug USB and verify device appears with: lsusb | grep 0694"
-                ),
-            )
-        if "No working DFU found." in output or "dfu-util" in output:
-            raise HTTPException(
-                status_code=501,
-                detail=(
-                    "Restore prerequisites are missing (dfu-util/libusb).\n"
-                    "Install tools on Linux: sudo apt update && sudo apt install -y dfu-util libusb-1.0-0\n"
-                    "Put SPIKE Prime in DFU mode: unplug USB, power OFF, hold Bluetooth button, plug USB, keep holding until LED flashes red/green/blue.\n"
-                    "If permission is denied, run: pybricksdev udev | sudo tee /etc/udev/rules.d/99-pybricksdev.rules && "
-                    "sudo udevadm control --reload-rules && sudo udevadm trigger"
-                ),
-            )
-        if "No DFU" in output:
-            raise HTTPException(
-                status_code=400,
-                detail=(
-                    "No DFU device found. Put SPIKE Prime in DFU mode, connect via USB, then try again."
-                ),
-            )
-        if "Permission to access USB device denied" in output:
-            raise HTTPException(
-                status_code=403,
-                detail=(
-                    "USB permission denied. Run: pybricksdev udev | sudo tee /etc/udev/rules.d/99-pybricksdev.rules "
-                    "then reload udev rules and reconnect the hub."
-                ),
-            )
+
+_preflight_task: Optional[asyncio.Task] = None
+
+
+async def _preflight_import() -> None:
+    proc = None
+    try:
+        proc = await asyncio.create_subprocess_exec(
+            *_PREFLIGHT_ARGV,
+            stdout=asyncio.subprocess.DEVNULL,
+            stderr=asyncio.subprocess.DEVNULL,
+        )
+        await asyncio.wait_for(proc.wait(), timeout=PREFLIGHT_TIMEOUT)
+    except asyncio.TimeoutError:
+        proc.kill()
+        await proc.wait()
+    except asyncio.CancelledError:
+        # Shutdown: do not leave the child interpreter behind
+        if proc is not None and proc.returncode is None:
+            proc.kill()
+            await proc.wait()
+        raise
+    except OSError:
+        pass
+
+
+def start_preflight() -> None:
+    """Import pybricksdev once in the background. Called on application startup.
+
+    The first flash otherwise pays for reading pybricksdev and its bleak/usb
+    dependencies from a cold disk; this primes the OS page cache.
+    """
+    global _preflight_task
+    if _preflight_task is None:
+        _preflight_task = asyncio.get_running_loop().create_task(_preflight_import())
+
+
+async def stop_preflight() -> None:
+    """Cancel a still-running preflight and reap its interpreter. Called on shutdown."""
+    global _preflight_task
+    task, _preflight_task = _preflight_task, None
+    if task is None:
+        return
+    task.cancel()
+    try:
+        await task
+    except asyncio.CancelledError:
+        pass
+
+
+def _copy_upload(upload: UploadFile, dest, limit: int, label: str) -> int:
+    """Copy ``upload`` into ``dest`` and return the byte count.
+
+    Raises 413 as soon as the upload is known to exceed ``limit``, before
+    copying when Starlette recorded its size, otherwise partway through.
+    This is blocking file I/O, so handlers call it through run_in_threadpool.
+    """
+    too_large = HTTPException(
+        status_code=413,
+        detail=f"{label} is too large (max {limit // (1024 * 1024)} MiB)",
+    )
+    if upload.size is not None and upload.size > limit:
+        raise too_large
+    total = 0
+    while chunk := upload.file.read(UPLOAD_COPY_CHUNK_SIZE):
+        total += len(chunk)
+        if total > limit:
+            raise too_large
+        dest.write(chunk)
+    return total
+
+
+async def _run_pybricksdev(argv: tuple[str, ...]) -> tuple[int, str]:
+    """Run a pybricksdev command line without blocking the event loop.
+
+    Returns (returncode, output) with stderr merged into stdout and the
+    result stripped. Raises asyncio.TimeoutError after killing the process
+    if it runs longer than PYBRICKSDEV_TIMEOUT. Runs are serialized by
+    _hub_lock.
+    """
+    async with _hub_lock:
+        proc = await asyncio.create_subprocess_exec(
+            *argv,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.STDOUT,
+        )
+        try:
+            stdout, _ = await asyncio.wait_for(proc.communicate(), timeout=PYBRICKSDEV_TIMEOUT)
+        except asyncio.TimeoutError:
+            proc.kill()
+            await proc.wait()
+            raise
+    return proc.returncode, stdout.decode("utf-8", errors="replace").strip()
+
+
+async def _restore_firmware_bin(bin_path: str, source_label: str) -> FirmwareInstallResponse:
+    returncode, output = await _run_pybricksdev(_RESTORE_ARGV_PREFIX + (bin_path,))
+    if returncode != 0:
+        matched = {m.group() for m in _RESTORE_ERROR_RE.finditer(output)}
+        if matched:
+            _, status_code, detail = min(_RESTORE_ERROR_BY_NEEDLE[needle] for needle in matched)
+            raise HTTPException(status_code=status_code, detail=detail)
         raise HTTPException(
             status_code=500,
-            detail=f"pybricksdev restore failed. {output.strip() or 'Unknown error'}",
+            detail=f"pybricksdev restore failed. {output or 'Unknown error'}",
         )
 
     return FirmwareInstallResponse(
         success=True,
         message=f"Restored LEGO firmware from {source_label}",
-        output=output.strip(),
+        output=output,
     )
 
 
-def _flash_firmware_zip(zip_path: str) -> str:
-    result = subprocess.run(
-        [sys.executable, "-m", "pybricksdev", "flash", zip_path],
-        capture_output=True,
-        text=True,
-        timeout=300,
-    )
-
-    output = (result.stdout or "") + ("\n" + result.stderr if result.stderr else "")
-    if result.returncode != 0:
+async def _flash_firmware_zip(zip_path: str) -> str:
+    returncode, output = await _run_pybricksdev(_FLASH_ARGV_PREFIX + (zip_path,))
+    if returncode != 0:
         if "No DFU devices found." in output:
             raise HTTPException(
                 status_code=400,
@@ -114,23 +283,40 @@ def _flash_firmware_zip(zip_path: str) -> str:
             )
         raise HTTPException(
             status_code=500,
-            detail=f"pybricksdev flash failed. {output.strip() or 'Unknown error'}",
+            detail=f"pybricksdev flash failed. {output or 'Unknown error'}",
         )
 
-    return output.strip()
+    return output
 
 
-def _get_latest_stable_primehub_asset_url() -> tuple[str, str]:
-    req = urllib.request.Request(
-        "https://api.github.com/repos/pybricks/pybricks-micropython/releases/latest",
-        headers={
-            "Accept": "application/vnd.github+json",
-            "User-Agent": "code-lego-spike-portal",
-        },
-    )
+async def _get_latest_stable_primehub_asset_url() -> tuple[str, str, int]:
+    """Return (asset_name, asset_url, asset_size); size is 0 if GitHub omits it."""
+    cached = _release_cache.get(GITHUB_LATEST_RELEASE_URL)
+    if cached and time.monotonic() < cached[0]:
+        return cached[2]
+
+    headers = {"Accept": "application/vnd.github+json"}
+    if _GITHUB_TOKEN:
+        headers["Authorization"] = f"Bearer {_GITHUB_TOKEN}"
+    if cached and cached[1]:
+        headers["If-None-Match"] = cached[1]
     try:
-        with urllib.request.urlopen(req, timeout=20) as response:
-            data = json.loads(response.read().decode("utf-8"))
+        response = await _get_http_client().get(GITHUB_LATEST_RELEASE_URL, headers=headers, timeout=20.0)
+        remaining = response.headers.get("X-RateLimit-Remaining", "")
+        if remaining.isdigit() and int(remaining) < _RATE_LIMIT_WARNING_THRESHOLD:
+            logger.warning(
+                "GitHub API rate limit nearly exhausted: %s requests left (resets at %s)%s",
+                remaining,
+                response.headers.get("X-RateLimit-Reset", "unknown"),
+                "" if _GITHUB_TOKEN else "; set GITHUB_TOKEN to raise the limit",
+            )
+        if response.status_code == 304 and cached:
+            # Release unchanged; keep the cached asset for another TTL
+            _release_cache[GITHUB_LATEST_RELEASE_URL] = (time.monotonic() + _CACHE_TTL, cached[1], cached[2])
+            return cached[2]
+        response.raise_for_status()
+        etag = response.headers.get("ETag", "")
+        data = orjson.loads(response.content)
     except Exception as exc:
         raise HTTPException(
             status_code=502,
@@ -138,12 +324,14 @@ def _get_latest_stable_primehub_asset_url() -> tuple[str, str]:
         )
 
     assets = data.get("assets") or []
-    pattern = re.compile(r"^pybricks-primehub-v\d+\.\d+\.\d+\.zip$", re.IGNORECASE)
     for asset in assets:
         name = str(asset.get("name") or "")
         url = str(asset.get("browser_download_url") or "")
-        if pattern.match(name) and url:
-            return name, url
+        if _PRIMEHUB_ASSET_RE.match(name) and url:
+            size = asset.get("size")
+            result = (name, url, size if isinstance(size, int) and size > 0 else 0)
+            _release_cache[GITHUB_LATEST_RELEASE_URL] = (time.monotonic() + _CACHE_TTL, etag, result)
+            return result
 
     raise HTTPException(
         status_code=404,
@@ -151,6 +339,106 @@ def _get_latest_stable_primehub_asset_url() -> tuple[str, str]:
     )
 
 
+async def _download_to_file(url: str, dest) -> int:
+    """Stream ``url`` into the open file ``dest`` and return the byte count."""
+    written = 0
+    try:
+        async with _get_http_client().stream("GET", url) as response:
+            response.raise_for_status()
+            # Content-Length only matches the decoded size for identity bodies
+            expected = None
+            if "Content-Encoding" not in response.headers:
+                expected = response.headers.get("Content-Length")
+            async for chunk in response.aiter_bytes(65536):
+                dest.write(chunk)
+                written += len(chunk)
+    except Exception as exc:
+        raise HTTPException(
+            status_code=502,
+            detail=f"Failed to download firmware archive: {exc}",
+        )
+
+    if expected and expected.isdigit() and written != int(expected):
+        raise HTTPException(
+            status_code=502,
+            detail=f"Downloaded firmware archive is truncated ({written} of {expected} bytes)",
+        )
+    return written
+
+
+def _evict_firmware_cache() -> None:
+    """Keep only the FW_CACHE_MAX_VERSIONS most recently used archives."""
+    entries = []
+    for entry in os.scandir(_FW_CACHE_DIR):
+        if entry.name.endswith(".zip"):
+            try:
+                entries.append((entry.stat().st_mtime, entry.path))
+            except FileNotFoundError:
+                pass
+    entries.sort(reverse=True)
+    for _, path in entries[FW_CACHE_MAX_VERSIONS:]:
+        _safe_unlink(path)
+
+
+def _ensure_private_cache_dir() -> None:
+    os.makedirs(_FW_CACHE_DIR, mode=0o700, exist_ok=True)
+    st = os.lstat(_FW_CACHE_DIR)
+    owned = not hasattr(os, "getuid") or st.st_uid == os.getuid()
+    if not stat.S_ISDIR(st.st_mode) or not owned or st.st_mode & 0o022:
+        raise HTTPException(
+            status_code=500,
+            detail=(
+                f"Firmware cache {_FW_CACHE_DIR} must be a directory owned by the "
+                "backend user and not writable by group or others"
+            ),
+        )
+
+
+def _is_cached_archive(path: str, size: int) -> bool:
+    """True if ``path`` is a regular file we own with the expected size."""
+    try:
+        st = os.lstat(path)
+    except FileNotFoundError:
+        return False
+    if not stat.S_ISREG(st.st_mode):
+        return False
+    if hasattr(os, "getuid") and st.st_uid != os.getuid():
+        return False
+    return st.st_size == size if size else st.st_size > 0
+
+
+async def _get_cached_firmware_zip(asset_name: str, asset_url: str, asset_size: int) -> str:
+    """Return a local path to the release archive, downloading it if needed.
+
+    The asset name carries the firmware version, so a cached file never goes
+    stale; it is reused only if its size matches the release asset, and is
+    written under a temp name and renamed into place.
+    """
+    _ensure_private_cache_dir()
+    path = os.path.join(_FW_CACHE_DIR, asset_name)
+    if _is_cached_archive(path, asset_size):
+        os.utime(path)  # mark as recently used for eviction
+        return path
+
+    fd, tmp_path = tempfile.mkstemp(dir=_FW_CACHE_DIR, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as tmp:
+            written = await _download_to_file(asset_url, tmp)
+        if not written:
+            raise HTTPException(status_code=502, detail="Downloaded firmware archive is empty")
+        if asset_size and written != asset_size:
+            raise HTTPException(
+                status_code=502,
+                detail=f"Downloaded firmware archive has {written} bytes, release lists {asset_size}",
+            )
+        os.replace(tmp_path, path)
+    finally:
+        _safe_unlink(tmp_path)
+
+    _evict_firmware_cache()
+    return path
+
+
 @router.post("/pybricks/install", response_model=FirmwareInstallResponse)
 async def install_pybricks_firmware(firmware: UploadFile = File(...)):
     """Flash Pybricks firmware using pybricksdev.
@@ -163,19 +451,18 @@ async def install_pybricks_firmware(firmware: UploadFile = File(...)):
 
     temp_path = ""
     try:
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".zip") as tmp:
-            content = await firmware.read()
-            if not content:
+        fd, temp_path = tempfile.mkstemp(suffix=".zip")
+        with os.fdopen(fd, "wb") as tmp:
+            await firmware.seek(0)
+            if not await run_in_threadpool(_copy_upload, firmware, tmp, MAX_FIRMWARE_ZIP_BYTES, "Firmware file"):
                 raise HTTPException(status_code=400, detail="Uploaded firmware file is empty")
-            tmp.write(content)
-            temp_path = tmp.name
 
-        output = _flash_firmware_zip(temp_path)
+        output = await _flash_firmware_zip(temp_path)
 
         return FirmwareInstallResponse(
             success=True,
             message="Pybricks firmware installed successfully.",
-            output=output.strip(),
+            output=output,
         )
 
     except FileNotFoundError:
@@ -183,40 +470,20 @@ async def install_pybricks_firmware(firmware: UploadFile = File(...)):
             status_code=501,
             detail="pybricksdev is not installed. Install with: pip install pybricksdev",
         )
-    except subprocess.TimeoutExpired:
+    except asyncio.TimeoutError:
         raise HTTPException(status_code=408, detail="Firmware flashing timed out")
     finally:
-        if temp_path and os.path.exists(temp_path):
-            os.remove(temp_path)
+        if temp_path:
+            _safe_unlink(temp_path)
 
 
 @router.post("/pybricks/install/primehub/stable", response_model=FirmwareInstallResponse)
 async def install_latest_stable_primehub_firmware():
     """Fetch latest stable PrimeHub firmware from GitHub releases and flash it."""
-    temp_path = ""
     try:
-        asset_name, asset_url = _get_latest_stable_primehub_asset_url()
-        req = urllib.request.Request(
-            asset_url,
-            headers={"User-Agent": "code-lego-spike-portal"},
-        )
-        try:
-            with urllib.request.urlopen(req, timeout=60) as response:
-                firmware_bytes = response.read()
-        except Exception as exc:
-            raise HTTPException(
-                status_code=502,
-                detail=f"Failed to download firmware archive: {exc}",
-            )
-
-        if not firmware_bytes:
-            raise HTTPException(status_code=502, detail="Downloaded firmware archive is empty")
-
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".zip") as tmp:
-            tmp.write(firmware_bytes)
-            temp_path = tmp.name
-
-        output = _flash_firmware_zip(temp_path)
+        asset_name, asset_url, asset_size = await _get_latest_stable_primehub_asset_url()
+        zip_path = await _get_cached_firmware_zip(asset_name, asset_url, asset_size)
+        output = await _flash_firmware_zip(zip_path)
 
         return FirmwareInstallResponse(
             success=True,
@@ -229,11 +496,8 @@ async def install_latest_stable_primehub_firmware():
             status_code=501,
             detail="pybricksdev is not installed. Install with: pip install pybricksdev",
         )
-    except subprocess.TimeoutExpired:
+    except asyncio.TimeoutError:
         raise HTTPException(status_code=408, detail="Firmware flashing timed out")
-    finally:
-        if temp_path and os.path.exists(temp_path):
-            os.remove(temp_path)
 
 
 @router.get("/lego/restore-info", response_model=LegoRestoreInfoResponse)
@@ -256,31 +520,30 @@ async def restore_lego_firmware_from_local_backup(backup: UploadFile = File(...)
 
     temp_path = ""
     try:
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".bin") as tmp:
-            content = await backup.read()
-            if not content:
+        fd, temp_path = tempfile.mkstemp(suffix=".bin")
+        with os.fdopen(fd, "wb") as tmp:
+            await backup.seek(0)
+            if not await run_in_threadpool(_copy_upload, backup, tmp, MAX_BACKUP_BIN_BYTES, "Backup file"):
                 raise HTTPException(status_code=400, detail="Uploaded backup file is empty")
-            tmp.write(content)
-            temp_path = tmp.name
 
-        return _restore_firmware_bin(temp_path, f"backup: {filename}")
+        return await _restore_firmware_bin(temp_path, f"backup: {filename}")
 
     except FileNotFoundError:
         raise HTTPException(
             status_code=501,
             detail="pybricksdev is not installed. Install with: pip install pybricksdev",
         )
-    except subprocess.TimeoutExpired:
+    except asyncio.TimeoutError:
         raise HTTPException(status_code=408, detail="Firmware restore timed out")
     finally:
-        if temp_path and os.path.exists(temp_path):
-            os.remove(temp_path)
+        if temp_path:
+            _safe_unlink(temp_path)
 
 
 @router.post("/lego/restore/bundled", response_model=FirmwareInstallResponse)
 async def restore_lego_firmware_from_bundled_bin():
     """Restore LEGO firmware from bundled BIN file on backend."""
-    if not os.path.exists(BUNDLED_LEGO_RESTORE_BIN_PATH):
+    if not _BUNDLED_BIN_OK:
         raise HTTPException(
             status_code=404,
             detail=(
@@ -289,7 +552,7 @@ async def restore_lego_firmware_from_bundled_bin():
             ),
         )
 
-    return _restore_firmware_bin(
+    return await _restore_firmware_bin(
         BUNDLED_LEGO_RESTORE_BIN_PATH,
-        f"bundled BIN: {os.path.basename(BUNDLED_LEGO_RESTORE_BIN_PATH)}",
+        f"bundled BIN: {_BUNDLED_BIN_BASENAME}",
     )
@@ -1,15 +1,77 @@
 """Program management API - CRUD operations for Python programs."""
 
 from fastapi import APIRouter, HTTPException
+from fastapi.responses import Response
 from pydantic import BaseModel, Field
 from typing import Optional, List
-from datetime import datetime
+from datetime import datetime, timezone
+import orjson
+import time
 import uuid
 
 router = APIRouter()
 
+
+class _ProgramStore:
+    """In-memory program records with cached list snapshots.
+
+    Mutations drop the cached tuple of records and its serialized JSON body;
+    both are rebuilt on the next list, so repeated GETs cost nothing extra.
+    Records are stored in ProgramResponse shape, so the list body is served
+    without re-validating every program.
+    """
+
+    __slots__ = ("_items", "_snapshot", "_body")
+
+    def __init__(self):
+        self._items: dict[str, dict] = {}
+        self._snapshot: Optional[tuple[dict, ...]] = None
+        self._body: Optional[bytes] = None
+
+    def __contains__(self, program_id: str) -> bool:
+        return program_id in self._items
+
+    def __getitem__(self, program_id: str) -> dict:
+        return self._items[program_id]
+
+    def __setitem__(self, program_id: str, record: dict) -> None:
+        self._items[program_id] = record
+        self._invalidate()
+
+    def __delitem__(self, program_id: str) -> None:
+        del self._items[program_id]
+        self._invalidate()
+
+    def _invalidate(self) -> None:
+        self._snapshot = None
+        self._body = None
+
+    def snapshot(self) -> tuple[dict, ...]:
+        if self._snapshot is None:
+            self._snapshot = tuple(self._items.values())
+        return self._snapshot
+
+    def list_body(self) -> bytes:
+        if self._body is None:
+            self._body = orjson.dumps(self.snapshot())
+        return self._body
+
+
 # In-memory storage (replace with database in production)
-programs_db: dict[str, dict] = {}
+programs_db = _ProgramStore()
+
+
+# [epoch second, ISO timestamp] for the last formatted second
+_iso_cache: list = [-1, ""]
+
+
+def _iso_now() -> str:
+    """Current UTC time as an ISO 8601 string, reformatted at most once a second."""
+    second = int(time.time())
+    if second != _iso_cache[0]:
+        _iso_cache[0] = second
+        _iso_cache[1] = datetime.fromtimestamp(second, timezone.utc).isoformat(timespec="seconds")
+    return _iso_cache[1]
 
 
 class ProgramCreate(BaseModel):
@@ -36,10 +98,10 @@ class ProgramResponse(BaseModel):
     updated_at: str
 
 
-@router.get("/", response_model=List[ProgramResponse])
+@router.get("/", responses={200: {"model": List[ProgramResponse]}})
 async def list_programs():
     """List all saved programs."""
-    return list(programs_db.values())
+    return Response(content=programs_db.list_body(), media_type="application/json")
 
 
 @router.get("/{program_id}", response_model=ProgramResponse)
@@ -53,8 +115,8 @@ async def get_program(program_id: str):
 @router.post("/", response_model=ProgramResponse, status_code=201)
 async def create_program(program: ProgramCreate):
     """Create a new program."""
-    program_id = str(uuid.uuid4())
-    now = datetime.utcnow().isoformat()
+    program_id = uuid.uuid4().hex
+    now = _iso_now()
     program_data = {
         "id": program_id,
         "name": program.name,
@@ -75,9 +137,10 @@ async def update_program(program_id: str, program: ProgramUpdate):
         raise HTTPException(status_code=404, detail="Program not found")
 
     existing = programs_db[program_id]
-    update_data = program.model_dump(exclude_unset=True)
-    existing.update(update_data)
-    existing["updated_at"] = datetime.utcnow().isoformat()
+    # Only the fields the client sent; every one is already a key of the record
+    for name in program.model_fields_set:
+        existing[name] = getattr(program, name)
+    existing["updated_at"] = _iso_now()
     programs_db[program_id] = existing
     return existing
 
@@ -0,0 +1,103 @@
+"""Pre-serialized JSON payloads for read-only endpoints.
+
+The docs and examples data is fixed for the lifetime of a deploy, so each
+payload is serialized and compressed once, and served with a strong ETag that
+lets clients revalidate with a bodiless 304.
+"""
+
+import gzip
+import hashlib
+import orjson
+from fastapi import Request
+from fastapi.responses import Response
+
+try:
+    import brotli
+except ImportError:  # gzip-only without the optional brotli package
+    brotli = None
+
+CACHE_CONTROL = "public, max-age=86400, immutable"
+NOT_FOUND_CACHE_CONTROL = "public, max-age=300"
+
+
+def _accepted_encodings(header: str) -> set[str]:
+    """Parse Accept-Encoding, leaving out codings explicitly refused with q=0."""
+    encodings = set()
+    for item in header.split(","):
+        coding, _, params = item.partition(";")
+        name, _, value = params.strip().partition("=")
+        if name.strip() == "q":
+            try:
+                if float(value) <= 0:
+                    continue
+            except ValueError:
+                continue
+        encodings.add(coding.strip().lower())
+    return encodings
+
+
+class StaticJSON:
+    """A JSON payload serialized and compressed once, with per-encoding ETags."""
+
+    __slots__ = ("content", "etag", "variants", "_etags")
+
+    def __init__(self, obj):
+        self.content = orjson.dumps(obj)
+        digest = hashlib.sha1(self.content).hexdigest()
+        self.etag = f'"{digest}"'
+
+        # (encoding, body, etag), best first; only kept when actually smaller
+        self.variants = []
+        if brotli is not None:
+            self._add_variant("br", brotli.compress(self.content, quality=11), digest)
+        self._add_variant("gzip", gzip.compress(self.content, compresslevel=9, mtime=0), digest)
+        self._etags = {self.etag} | {etag for _, _, etag in self.variants}
+
+    def _add_variant(self, encoding: str, body: bytes, digest: str) -> None:
+        if len(body) < len(self.content):
+            self.variants.append((encoding, body, f'"{digest}-{encoding}"'))
+
+    def _not_modified(self, request: Request) -> bool:
+        if_none_match = request.headers.get("if-none-match")
+        if not if_none_match:
+            return False
+        if if_none_match.strip() == "*":
+            return True
+        tags = (tag.strip().removeprefix("W/") for tag in if_none_match.split(","))
+        return any(tag in self._etags for tag in tags)
+
+    def response(self, request: Request) -> Response:
+        headers = {"Cache-Control": CACHE_CONTROL}
+        content, etag = self.content, self.etag
+        accepted = _accepted_encodings(request.headers.get("accept-encoding", ""))
+        for encoding, body, variant_etag in self.variants:
+            if encoding in accepted:
+                content, etag = body, variant_etag
+                headers["Content-Encoding"] = encoding
+                break
+        headers["ETag"] = etag
+
+        # Set even when GZipMiddleware will add its own: whether it does for
+        # uncompressed bodies depends on the Starlette version, and a
+        # repeated Vary token is harmless.
+        if self.variants:
+            headers["Vary"] = "Accept-Encoding"
+        if self._not_modified(request):
+            headers.pop("Content-Encoding", None)
+            return Response(status_code=304, headers=headers)
+        return Response(content=content, media_type="application/json", headers=headers)
+
+
+def not_found(content: bytes) -> Response:
+    """A 404 for an unknown static resource, cacheable by browsers and CDNs.
+
+    Cheaper than raising HTTPException, which goes through Starlette's
+    exception middleware on every miss.
+    """
+    return Response(
+        content=content,
+        status_code=404,
+        media_type="application/json",
+        headers={"Cache-Control": NOT_FOUND_CACHE_CONTROL},
+    )
+
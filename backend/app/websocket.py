@@ -1,35 +1,92 @@
 """WebSocket connection manager for real-time communication."""
 
+import asyncio
 from fastapi import WebSocket
-from typing import List
+from typing import Dict, List, Optional, Union
+
+
+class _Channel:
+    """A connected client with its own outbound queue and relay task."""
+
+    def __init__(self, websocket: WebSocket, maxsize: int):
+        self.websocket = websocket
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=maxsize)
+        self.task: Optional[asyncio.Task] = None
 
 
 class ConnectionManager:
-    """Manages WebSocket connections for real-time terminal output relay."""
+    """Manages WebSocket connections for real-time terminal output relay.
+
+    Each connection gets a bounded queue drained by its own relay task, so
+    broadcasting never waits on a slow client. When a client's queue is full
+    the oldest pending output is dropped, and the relay coalesces bursts of
+    small terminal writes into frames of up to MAX_BATCH_CHARS.
+    """
+
+    QUEUE_SIZE = 64
+    MAX_BATCH_CHARS = 16384
 
     def __init__(self):
-        self.active_connections: List[WebSocket] = []
+        self._channels: Dict[WebSocket, _Channel] = {}
+
+    @property
+    def active_connections(self) -> List[WebSocket]:
+        return list(self._channels)
 
     async def connect(self, websocket: WebSocket):
         await websocket.accept()
-        self.active_connections.append(websocket)
+        channel = _Channel(websocket, self.QUEUE_SIZE)
+        channel.task = asyncio.create_task(self._relay(channel))
+        self._channels[websocket] = channel
 
     def disconnect(self, websocket: WebSocket):
-        if websocket in self.active_connections:
-            self.active_connections.remove(websocket)
+        channel = self._channels.pop(websocket, None)
+        if channel is not None and channel.task is not None:
+            if channel.task is not asyncio.current_task():
+                channel.task.cancel()
 
     async def send_personal_message(self, message: str, websocket: WebSocket):
         await websocket.send_text(message)
 
-    async def broadcast(self, message: str):
-        disconnected = []
-        for connection in self.active_connections:
-            try:
-                await connection.send_text(message)
-            except Exception:
-                disconnected.append(connection)
-        for conn in disconnected:
-            self.disconnect(conn)
+    async def broadcast(self, message: Union[str, bytes]):
+        """Queue a message for every client.
+
+        The same object is enqueued for each connection, so no per-client copy
+        is made. Bytes are relayed as binary frames, str as text frames.
+        """
+        for channel in self._channels.values():
+            queue = channel.queue
+            if queue.full():
+                # Ring-buffer semantics: a slow client loses its oldest output
+                queue.get_nowait()
+            queue.put_nowait(message)
+
+    async def _relay(self, channel: _Channel):
+        queue = channel.queue
+        carry = None
+        try:
+            while True:
+                first = carry if carry is not None else await queue.get()
+                carry = None
+                batch = [first]
+                size = len(first)
+                while size < self.MAX_BATCH_CHARS and not queue.empty():
+                    message = queue.get_nowait()
+                    if type(message) is not type(first):
+                        # Never merge text and binary frames
+                        carry = message
+                        break
+                    batch.append(message)
+                    size += len(message)
+                data = first[:0].join(batch)
+                if isinstance(data, bytes):
+                    await channel.websocket.send_bytes(data)
+                else:
+                    await channel.websocket.send_text(data)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            self.disconnect(channel.websocket)
 
 
 connection_manager = ConnectionManager()